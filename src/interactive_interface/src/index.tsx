@@ -393,10 +393,12 @@ interface GameData {
   languages: Array<string>;
   translated_name: string;
   devmode: boolean;
+  offline?: boolean;
   library_zip_fn: string;
   introData: LevelData;
   worlds: Array<WorldData>;
-  texts: Array<Array<string>>;
+  texts?: Array<Array<string>>;
+  text_bundles?: Array<string>;
 }
 // **********************************************************
 
@@ -1071,7 +1073,7 @@ Graph.contextType = CurrentLanguageIndexContext;
 interface LanguageMenuProps {
   languages: Array<string>;
   currentLanguageIndex: number;
-  updateLanguageIndex: (i: number)=>void;
+  updateLanguageIndex: (i: number)=>Promise<void>;
 }
 interface LanguageMenuState {
   value: number;
@@ -1085,8 +1087,11 @@ class LanguageMenu extends React.Component<LanguageMenuProps, LanguageMenuState>
   }
 
   handleChange(event) {
-    this.props.updateLanguageIndex(Number(event.target.value));
-    this.setState({value: event.target.value});
+    const i = Number(event.target.value);
+    // The menu only changes once the texts of the new language are loaded.
+    this.props.updateLanguageIndex(i)
+      .then(()=> this.setState({value: i}))
+      .catch((err)=> alert(`Could not load the texts in ${this.props.languages[i].toUpperCase()}: ${err.message}`));
   }
 
   render() {
@@ -1114,7 +1119,7 @@ interface GameProps {
   introData: LevelData;
   world: number;
   level: number;
-  updateLanguageIndex: (i: number)=>void;
+  updateLanguageIndex: (i: number)=>Promise<void>;
   saveGame: ()=>void;
   saveGameToFile: ()=>void;
   loadGameFromFile: (input: FileList)=>void;
@@ -1215,10 +1220,9 @@ class Game extends React.Component<GameProps, GameState> {
       dangerouslySetInnerHTML={{__html: this.state.darkMode ? "&#x1f506;" : "&#x1f505;"}}></button>;
     
     const languageMenu = <LanguageMenu languages={this.props.languages} currentLanguageIndex={this.state.currentLanguageIndex}
-      updateLanguageIndex={(i: number)=>{
-        this.props.updateLanguageIndex(i);
-        this.setState({currentLanguageIndex: i});
-      }}/>;
+      updateLanguageIndex={(i: number)=>
+        this.props.updateLanguageIndex(i).then(() => this.setState({currentLanguageIndex: i}))
+      }/>;
 
     if(this.state.world == -1){
 
@@ -1583,9 +1587,7 @@ class PageManager {
 
 
     this.gameData = blankGameData;
-    gameTexts = this.gameData.texts;
-
-    document.title = gameTexts[this.currentLanguageIndex][this.gameData.translated_name];
+    gameTexts = this.gameData.texts || new Array(this.gameData.languages.length);
 
     this.readURL();
 
@@ -1641,13 +1643,33 @@ class PageManager {
   }
 
   
-  static updateLanguageIndex(index: number){
-    if(this.currentLanguageIndex != index){
-      this.isSaved = false;
-      document.title = gameTexts[index][this.gameData.translated_name];
-      this.currentLanguageIndex = index;
-      setTimeout(renderLaTeX, 500);
+  // If the game is built with "--split_locales", the texts of each language are in a separate file.
+  static fetchTexts(index: number): Promise<void> {
+    if(gameTexts[index]){
+      return Promise.resolve();
     }
+    const url = this.gameData.text_bundles[index];
+    return fetch(url)
+      .then((res)=>{
+        if(!res.ok){
+          throw new Error(`Failed to fetch "${url}" (${res.status} ${res.statusText}).`);
+        }
+        return res.json();
+      })
+      .then((texts)=>{
+        gameTexts[index] = texts;
+      });
+  }
+
+  static updateLanguageIndex(index: number): Promise<void> {
+    return this.fetchTexts(index).then(()=>{
+      if(this.currentLanguageIndex != index){
+        this.isSaved = false;
+        document.title = gameTexts[index][this.gameData.translated_name];
+        this.currentLanguageIndex = index;
+        setTimeout(renderLaTeX, 500);
+      }
+    });
   }
 
   static run(){
@@ -1659,8 +1681,34 @@ class PageManager {
     fetch('game_data.json', {cache: "no-store"})
       .then((res)=> res.json())
       .then((blankGameData)=>{
-
         const isInfoMessage = this.loadGame(blankGameData as GameData).isInfoMessage;
+        return this.fetchTexts(this.currentLanguageIndex)
+          .catch((err)=>{
+            // Fall back to the first language if the saved one can't be loaded.
+            if(this.currentLanguageIndex == 0){
+              throw err;
+            }
+            console.error(err);
+            this.currentLanguageIndex = 0;
+            return this.fetchTexts(0);
+          })
+          .then(()=> isInfoMessage);
+      })
+      .then((isInfoMessage)=>{
+
+        document.title = gameTexts[this.currentLanguageIndex][this.gameData.translated_name];
+
+        if('serviceWorker' in navigator){
+          if(this.gameData.offline){
+            navigator.serviceWorker.register('./service-worker.js');
+          }else{
+            // Remove the service worker of an earlier build made with "--offline".
+            navigator.serviceWorker.getRegistration().then((registration)=>{
+              if(registration && registration.scope == new URL('./', window.location.href).href)
+                registration.unregister();
+            });
+          }
+        }
 
         let dbName = this.gameData.library_zip_fn.slice(0, -4);
         
@@ -1702,7 +1750,11 @@ class PageManager {
           loadLibraryAndRender();
         }
   
-      })      
+      })
+      .catch((err)=>{
+        console.error(err);
+        document.getElementById('root').textContent = `Could not load the game: ${err.message}`;
+      });
   }
    
 }
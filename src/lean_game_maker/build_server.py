@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import os, sys, json, time, tempfile, threading, itertools, contextlib, socketserver
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from lean_game_maker.builder import render_lean_project
+
+build_options = {
+    'outdir': str,
+    'nolib': bool,
+    'devmode': bool,
+    'locale': str,
+    'library_store': str,
+    'reproducible': bool,
+    'split_locales': bool,
+    'offline': bool,
+}
+
+
+def parse_build_request(body):
+    """Returns the directory and the options of a build request, or raises ValueError."""
+    request = json.loads(body)
+    if not isinstance(request, dict):
+        raise ValueError('The request must be a JSON object.')
+    if not isinstance(request.get('directory'), str):
+        raise ValueError('The field "directory" must be a string.')
+    options = {}
+    for k, v in request.items():
+        if k == 'directory':
+            continue
+        if k not in build_options:
+            raise ValueError(f'Unknown field "{k}".')
+        if not isinstance(v, build_options[k]):
+            raise ValueError(f'The field "{k}" must be of type {build_options[k].__name__}.')
+        options[k] = v
+    return request['directory'], options
+
+
+@contextlib.contextmanager
+def redirect_output(log):
+    """Sends stdout and stderr to the file `log`, at the file descriptor level,
+    so that the output of subprocesses like `leanpkg build` is captured too."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    try:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        os.close(saved[0])
+        os.close(saved[1])
+
+
+def run_build(directory, options):
+    """Runs in a worker process. Workers are reused, so imports and the caches
+    in `interactive_loader` and `translator` stay warm between builds."""
+    started = time.time()
+    error = None
+    with tempfile.TemporaryFile() as log:
+        try:
+            os.chdir(directory)
+            with redirect_output(log):
+                render_lean_project(**options)
+        except Exception as e:
+            error = str(e)
+        log.seek(0)
+        output = log.read().decode('utf8', errors='replace')
+    return {'started': started, 'finished': time.time(), 'log': output, 'error': error}
+
+
+class BuildQueue:
+    def __init__(self, workers, history=100):
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.builds = {}
+        self.history = history # number of finished builds whose status and log are kept
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def submit(self, directory, options):
+        directory = str(Path(directory).resolve())
+        if not (Path(directory)/'game_config.toml').is_file():
+            raise FileNotFoundError(f'Could not find "game_config.toml" in "{directory}".')
+        with self.lock:
+            for build in self.builds.values():
+                if build['directory'] == directory and not build['future'].done():
+                    raise RuntimeError(f'A build of "{directory}" is already in progress (id {build["id"]}).')
+            build_id = next(self.ids)
+            self.builds[build_id] = {
+                'id': build_id,
+                'directory': directory,
+                'options': options,
+                'submitted': time.time(),
+                'future': self.executor.submit(run_build, directory, options),
+            }
+            finished = [i for i in sorted(self.builds) if self.builds[i]['future'].done()]
+            for i in finished[:max(len(finished) - self.history, 0)]:
+                del self.builds[i]
+        return build_id
+
+    def status(self, build_id, with_log=False):
+        """Raises KeyError if there is no build `build_id`, or if it was removed from the history."""
+        with self.lock:
+            build = self.builds[build_id]
+        return self.build_status(build, with_log)
+
+    def build_status(self, build, with_log=False):
+        future = build['future']
+        status = {k: build[k] for k in ['id', 'directory', 'options', 'submitted']}
+        if not future.done():
+            status['status'] = 'running' if future.running() else 'queued'
+            return status
+        if future.exception():
+            result = {'error': str(future.exception()), 'log': ''}
+        else:
+            result = future.result()
+            status['timings'] = {
+                'queued': result['started'] - build['submitted'],
+                'build': result['finished'] - result['started'],
+            }
+        status['status'] = 'failed' if result['error'] else 'done'
+        status['error'] = result['error']
+        if with_log:
+            status['log'] = result['log']
+        return status
+
+    def all_status(self):
+        with self.lock:
+            builds = [self.builds[i] for i in sorted(self.builds)]
+        return [self.build_status(build) for build in builds]
+
+
+class BuildRequestHandler(BaseHTTPRequestHandler):
+    """JSON API:
+        POST /builds        {"directory": ..., "outdir": ..., "nolib": ..., "devmode": ..., "locale": ..., "library_store": ..., "reproducible": ..., "split_locales": ..., "offline": ...}
+        GET  /builds        status of every build
+        GET  /builds/<id>   status and log of one build
+    Only the last `history` finished builds are kept.
+    """
+
+    def send_json(self, code, data):
+        body = json.dumps(data).encode('utf8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if parts == ['builds']:
+            self.send_json(200, self.server.queue.all_status())
+            return
+        if len(parts) == 2 and parts[0] == 'builds' and parts[1].isdigit():
+            try:
+                self.send_json(200, self.server.queue.status(int(parts[1]), with_log=True))
+                return
+            except KeyError:
+                pass
+        self.send_json(404, {'error': f'Unknown path "{self.path}".'})
+
+    def do_POST(self):
+        if self.path.strip('/') != 'builds':
+            self.send_json(404, {'error': f'Unknown path "{self.path}".'})
+            return
+        try:
+            directory, options = parse_build_request(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            build_id = self.server.queue.submit(directory, options)
+        except (ValueError, FileNotFoundError) as e:
+            self.send_json(400, {'error': str(e)})
+        except RuntimeError as e:
+            self.send_json(409, {'error': str(e)})
+        else:
+            self.send_json(202, self.server.queue.status(build_id))
+
+    def address_string(self):
+        # Unix sockets have no client address.
+        return str(self.client_address[0]) if self.client_address else 'unix'
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(host='127.0.0.1', port=8000, socket=None, workers=2, history=100):
+    if socket:
+        if Path(socket).exists():
+            Path(socket).unlink()
+        server = ThreadingUnixHTTPServer(socket, BuildRequestHandler)
+        print(f'Listening on {socket}')
+    else:
+        server = ThreadingHTTPServer((host, port), BuildRequestHandler)
+        print(f'Listening on http://{host}:{port}')
+    server.queue = BuildQueue(workers, history)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.queue.executor.shutdown(wait=False)
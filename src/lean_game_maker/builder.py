@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+import os, re, json, hashlib, tempfile
+import distutils.dir_util
+from datetime import datetime, timezone
+from pathlib import Path
+import jsonpickle
+import jinja2
+import toml
+
+import lean_game_maker
+from lean_game_maker.line_reader import FileReader
+from lean_game_maker.translator import Translator
+from lean_game_maker.objects import default_line_handler, readers_list
+from lean_game_maker.interactive_loader import InteractiveServer
+
+module_path = Path(lean_game_maker.__file__).parent
+interactive_path = module_path.parent / 'interactive_interface'
+
+def get_build_date():
+    """The date recorded in reproducible builds. It is read from the SOURCE_DATE_EPOCH
+    environment variable and defaults to 1980-01-01, the earliest date a zip file can store."""
+    source_date_epoch = os.environ.get('SOURCE_DATE_EPOCH', '315532800')
+    error = f'SOURCE_DATE_EPOCH must be a non-negative number of seconds, not "{source_date_epoch}".'
+    if not source_date_epoch.strip().isdigit():
+        raise Exception(error)
+    try:
+        return datetime.fromtimestamp(int(source_date_epoch), timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise Exception(error)
+
+def write_text_bundle(outdir, lang, texts):
+    """Writes the texts of one language and returns the name of the file. The name contains
+    the hash of the content, so a bundle never changes once it has been cached by a browser."""
+    content = json.dumps(texts)
+    fn = f'game_data.{lang}.{hashlib.sha256(content.encode("utf8")).hexdigest()[:16]}.json'
+    with open(str(Path(outdir)/fn), 'w', encoding='utf8') as f:
+        f.write(content)
+    return fn
+
+def remove_old_text_bundles(outdir, keep):
+    """Removes the text bundles of earlier builds from the output folder, except those in `keep`."""
+    for f in Path(outdir).glob('game_data.*.json'):
+        if re.fullmatch(r'game_data\.[^.]+\.[0-9a-f]{16}\.json', f.name) and f.name not in keep:
+            f.unlink()
+
+def write_service_worker(outdir, offline, outputs):
+    """With `offline`, writes a precache manifest with the hash of every file in `outputs`,
+    the files of this build, and a service worker that serves them from the browser cache.
+    Otherwise, a service worker left by an earlier build is replaced by one that removes itself."""
+    sw_path = Path(outdir)/'service-worker.js'
+    manifest_path = Path(outdir)/'precache-manifest.json'
+    if offline:
+        files = {Path(os.path.relpath(str(Path(fn).resolve()), str(Path(outdir).resolve()))).as_posix():
+                hashlib.sha256(Path(fn).read_bytes()).hexdigest() for fn in sorted(set(outputs))}
+        version = hashlib.sha256(json.dumps(files, sort_keys=True).encode('utf8')).hexdigest()[:16]
+        manifest = {'version': version, 'files': files}
+        with open(str(manifest_path), 'w', encoding='utf8') as f:
+            json.dump(manifest, f, sort_keys=True)
+    elif sw_path.is_file():
+        manifest = None
+        if manifest_path.is_file():
+            manifest_path.unlink()
+    else:
+        return
+    template = jinja2.Template((module_path/'templates'/'service-worker.js').read_text(encoding='utf8'))
+    sw_path.write_text(template.render(manifest=json.dumps(manifest, sort_keys=True)), encoding='utf8')
+
+def render_lean_project(outdir=None, nolib=False, devmode=False, locale='en', library_store=None, reproducible=False,
+        split_locales=False, offline=False):
+
+    build_date = get_build_date() if reproducible else None
+
+    outdir = outdir or 'html'
+    Path(outdir).mkdir(exist_ok=True)
+
+
+    game_config = toml.load('game_config.toml')
+    ### TODO: check for errors
+
+    # Files written by this build, for the precache manifest. Other files in outdir may be left from older builds.
+    outputs = []
+
+    if 'extra_files' in game_config and Path(game_config['extra_files']).is_dir():
+        outputs += distutils.dir_util.copy_tree(str(Path('.')/game_config['extra_files']), str(Path(outdir)/game_config['extra_files']))
+
+
+    name = game_config.get('name', 'Lean game')
+    version = str(game_config.get('version', ''))
+    translator = Translator(locale, version, build_date)
+
+    game_data = {
+        'name'   : name,
+        'version': version,
+        'languages': translator.languages,
+        'translated_name': translator.register(name, True, occ='game_config'),
+        'devmode': devmode,
+        'offline': offline,
+        'library_zip_fn': f'{name}-{version}-library.zip',
+        'introData': {},
+        'worlds' : [],
+        'texts': {},
+    }
+
+
+    outputs += InteractiveServer(interactive_path=interactive_path, outdir=outdir,
+            library_zip_fn= game_data['library_zip_fn'], library_store=library_store,
+            build_date=build_date).copy_files(make_lib = not nolib)
+
+
+    file_reader = FileReader(translator, default_line_handler, readers_list)
+
+    print(f"Intro page ...", end="")
+    game_data['introData'] = file_reader.read_file(game_config['intro'], occ='intro')
+    game_data['introData']['problemIndex'] = -1
+    print(f"\rIntro page ... done")
+
+    for w, world_config in enumerate(game_config['worlds']):
+        print(f"{world_config['name']} :")
+
+        world_data = {
+            'name': translator.register(world_config['name'], True, occ='world_config'),
+            'levels' : []
+        }
+
+        if world_config.get('id', w+1) != w+1:
+            raise Exception("World id must start with 1 and increase by 1 at each world.")
+
+        if 'parents' in world_config:
+            world_data['parents'] = []
+            for i in world_config['parents']:
+                if i >= w+1:
+                    raise Exception("Parent ID must be smaller than the world ID.")
+                world_data['parents'].append(i-1)
+
+        for i, level_address in enumerate(world_config['levels']):
+            print(f"\tlevel {i+1} ...", end="")
+            level_data = file_reader.read_file(level_address, occ=f"{world_config['name']} level {i+1}")
+            world_data['levels'].append(level_data)
+            print(f"\r\tlevel {i+1} ... done")
+
+        if world_data['levels']:
+            game_data['worlds'].append(world_data)
+        else:
+            raise Exception(f'World {w+1} has no levels.')
+
+    if split_locales:
+        # One file of texts per language, so that players only download the language they use.
+        del game_data['texts']
+        game_data['text_bundles'] = [write_text_bundle(outdir, lang, texts)
+                for lang, texts in zip(translator.languages, translator.translated_texts)]
+        outputs += [str(Path(outdir)/fn) for fn in game_data['text_bundles']]
+    else:
+        game_data['texts'] = translator.translated_texts
+    remove_old_text_bundles(outdir, game_data.get('text_bundles', []))
+
+    with open(str(Path(outdir)/'game_data.json'), 'w', encoding='utf8') as f:
+        jsonpickle.set_encoder_options('json', sort_keys=reproducible)
+        try:
+            f.write(jsonpickle.encode(game_data, unpicklable=False))
+        finally:
+            jsonpickle.set_encoder_options('json', sort_keys=False)
+
+    outputs.append(str(Path(outdir)/'game_data.json'))
+
+    translator.save_pot()
+
+    write_service_worker(outdir, offline, outputs)
+
+
+def render_lean_projects(*directories, library_store=None, outdir=None, nolib=False, devmode=False, locale='en',
+        reproducible=False, split_locales=False, offline=False):
+    """Builds several games in one run. With `library_store`, the olean files
+    of their common dependencies are compressed and stored only once."""
+    if library_store:
+        library_store = str(Path(library_store).resolve())
+    cwd = os.getcwd()
+    failed = []
+    for directory in directories:
+        print(f"==== {directory} ====")
+        try:
+            os.chdir(directory)
+            render_lean_project(outdir=outdir, nolib=nolib, devmode=devmode, locale=locale, library_store=library_store,
+                    reproducible=reproducible, split_locales=split_locales, offline=offline)
+        except Exception as e:
+            print('\n\nError:', e)
+            failed.append(directory)
+        finally:
+            os.chdir(cwd)
+    print(f"Built {len(directories) - len(failed)} of {len(directories)} games.")
+    if failed:
+        raise Exception('Failed to build ' + ', '.join(failed))
+
+
+def hash_files(directory):
+    return {f.relative_to(directory).as_posix(): hashlib.sha256(f.read_bytes()).hexdigest()
+            for f in sorted(Path(directory).glob('**/*')) if f.is_file()}
+
+def verify_reproducible(nolib=False, devmode=False, locale='en', library_store=None, split_locales=False,
+        offline=False):
+    """Builds the game twice in reproducible mode and compares the hashes of the outputs."""
+    hashes = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(2):
+            outdir = Path(tmp)/f'build{i}'
+            render_lean_project(outdir=str(outdir), nolib=nolib, devmode=devmode, locale=locale,
+                    library_store=library_store, reproducible=True, split_locales=split_locales,
+                    offline=offline)
+            hashes.append(hash_files(outdir))
+            hashes[-1]['locale/content.pot'] = hash_files('locale')['content.pot']
+
+    different = sorted(f for f in set(hashes[0]) | set(hashes[1]) if hashes[0].get(f) != hashes[1].get(f))
+    if different:
+        raise Exception('The two builds differ in:\n\t' + '\n\t'.join(different))
+    print(f"The two builds are identical ({len(hashes[0])} files).")
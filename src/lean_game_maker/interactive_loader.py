@@ -5,23 +5,48 @@ import glob, distutils.dir_util
 from pathlib import Path
 import toml
 
+from lean_game_maker.library_store import LibraryStore, olean_zip_info
+
+
+# Toolchain metadata is kept between builds so that a long-running process
+# (see build_server.py) only probes `lean` when something actually changed.
+_lean_version_cache = {}
+_lean_path_cache = {}
+
+def get_lean_version(toolchain):
+    if toolchain not in _lean_version_cache:
+        _lean_version_cache[toolchain] = subprocess.run(['lean', '-v'], capture_output=True, encoding="utf-8").stdout
+    return _lean_version_cache[toolchain]
+
+def get_lean_path(toolchain):
+    key = (toolchain, str(Path('.').resolve()), Path('leanpkg.toml').stat().st_mtime)
+    if key not in _lean_path_cache:
+        lean_p = json.loads(subprocess.check_output(['lean', '-p']))
+        _lean_path_cache[key] = [Path(p).resolve() for p in lean_p["path"]]
+    return _lean_path_cache[key]
+
 
 class InteractiveServer:
-    def __init__(self, interactive_path, outdir, library_zip_fn):
+    def __init__(self, interactive_path, outdir, library_zip_fn, library_store=None, build_date=None):
         self.interactive_path = interactive_path
         self.outdir = outdir
         self.library_zip_fn = str( (Path(self.outdir) / library_zip_fn).resolve() )
+        self.library_store = LibraryStore(library_store) if library_store else None
+        # In reproducible builds, every file in the library gets the same timestamp.
+        # Zip files can only store dates from 1980 to 2107, so other dates are clamped.
+        self.date_time = min(max(build_date.timetuple()[:6], (1980, 1, 1, 0, 0, 0)),
+                (2107, 12, 31, 23, 59, 58)) if build_date else None
 
         try:
             leanpkg_toml = toml.load('leanpkg.toml')
         except FileNotFoundError:
             raise FileNotFoundError("Couldn't find a leanpkg.toml, I give up.")
-        toolchain = leanpkg_toml['package']['lean_version']
+        self.toolchain = leanpkg_toml['package']['lean_version']
 
         if os.name == 'nt':
-            self.js_wasm_path = Path(self.interactive_path / 'lean_server' / toolchain.replace(':', ' '))
+            self.js_wasm_path = Path(self.interactive_path / 'lean_server' / self.toolchain.replace(':', ' '))
         else:
-            self.js_wasm_path = Path(self.interactive_path / 'lean_server' / toolchain)
+            self.js_wasm_path = Path(self.interactive_path / 'lean_server' / self.toolchain)
 
     def make_library(self):
         library_zip_fn = self.library_zip_fn
@@ -32,79 +57,96 @@ class InteractiveServer:
         subprocess.call(['leanpkg', 'build'])
 
         print('Using lean version:')
-        lean_version = subprocess.run(['lean', '-v'], capture_output=True, encoding="utf-8").stdout
+        lean_version = get_lean_version(self.toolchain)
         print(lean_version)
         lean_githash = re.search("commit ([a-z0-9]{12}),", lean_version).group(1)
         # assume leanprover-community repo
         core_url = 'https://raw.githubusercontent.com/leanprover-community/lean/{0}/library/'.format(lean_githash)
         core_name = 'lean/library'
 
-        lean_p = json.loads(subprocess.check_output(['lean', '-p']))
-        lean_path = [Path(p).resolve() for p in lean_p["path"]]
 
         already_seen = set()
         lib_info = {}
         oleans = {}
         num_olean = {}
+        segments = []
+        num_stored = 0
         Path(library_zip_fn).parent.mkdir(parents=True, exist_ok=True)
-        with zipfile.ZipFile(library_zip_fn, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=False, compresslevel=9) as zf:
-            for p in lean_path:
-                parts = p.parts
-                if str(p.resolve()) == source_lib_path: # if using source_lib/src
-                    lib_name = parts[-2]
-                    lib_info[lib_name] = '/library/' + lib_name
-                elif parts[-1] != 'library':
-                    lib_name = parts[-2] # assume lean_path contains _target/deps/name/src
-                    git_dir = str(p.parent)+'/.git'
-                    lib_rev = subprocess.run(['git', '--git-dir='+git_dir, 'rev-parse', 'HEAD'], capture_output=True, encoding="utf-8").stdout.rstrip()
-                    lib_repo_url = subprocess.run(['git', '--git-dir='+git_dir, 'config', '--get', 'remote.origin.url'], capture_output=True, encoding="utf-8").stdout.rstrip()
-                    # assume that repos are hosted at github
-                    lib_repo_match = re.search(r'github\.com[:/]([^\.]*)', lib_repo_url)
-                    if lib_repo_match:
-                        lib_repo = lib_repo_match.group(1)
-                        lib_info[lib_name] = 'https://raw.githubusercontent.com/{0}/{1}/src/'.format(lib_repo, lib_rev)
-                    elif lib_repo_url:
-                        lib_info[lib_name] = lib_repo_url
-                    else:
+        try:
+            with zipfile.ZipFile(library_zip_fn, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=False, compresslevel=9) as zf:
+                for p in get_lean_path(self.toolchain):
+                    parts = p.parts
+                    if str(p.resolve()) == source_lib_path: # if using source_lib/src
+                        lib_name = parts[-2]
+                        lib_rev = None # the game itself is never shared, so it is not put in the library store
                         lib_info[lib_name] = '/library/' + lib_name
-                else:
-                    lib_name = core_name
-                    lib_info[lib_name] = core_url
-                if lib_name not in num_olean.keys():
-                    num_olean[lib_name] = 0
-                for fn in p.glob('**/*.olean'):
-                    rel = fn.relative_to(p)
-                    # ignore transitive dependencies
-                    if '_target' in rel.parts:
-                        continue
-                    # ignore olean files from deleted / renamed lean files
-                    if not fn.with_suffix('.lean').is_file():
-                        continue
-                    elif rel in already_seen:
-                        print('duplicate: {0}'.format(fn))
+                    elif parts[-1] != 'library':
+                        lib_name = parts[-2] # assume lean_path contains _target/deps/name/src
+                        git_dir = str(p.parent)+'/.git'
+                        lib_rev = subprocess.run(['git', '--git-dir='+git_dir, 'rev-parse', 'HEAD'], capture_output=True, encoding="utf-8").stdout.rstrip()
+                        lib_repo_url = subprocess.run(['git', '--git-dir='+git_dir, 'config', '--get', 'remote.origin.url'], capture_output=True, encoding="utf-8").stdout.rstrip()
+                        # assume that repos are hosted at github
+                        lib_repo_match = re.search(r'github\.com[:/]([^\.]*)', lib_repo_url)
+                        if lib_repo_match:
+                            lib_repo = lib_repo_match.group(1)
+                            lib_info[lib_name] = 'https://raw.githubusercontent.com/{0}/{1}/src/'.format(lib_repo, lib_rev)
+                        elif lib_repo_url:
+                            lib_info[lib_name] = lib_repo_url
+                        else:
+                            lib_info[lib_name] = '/library/' + lib_name
                     else:
-                        zf.write(fn, arcname=str(rel))
-                        oleans[str(rel)[:-6]] = lib_name
-                        num_olean[lib_name] += 1
-                        already_seen.add(rel)
-                if num_olean[lib_name] == 0:
-                    del lib_info[lib_name]
-                else:
-                    print('Added {0} olean files from {1}'.format(num_olean[lib_name], lib_name))
-        print('Created {0} with {1} olean files'.format(library_zip_fn, len(already_seen)))
-
-        library_prefix = os.path.splitext(library_zip_fn)[0]
-        info_fn = library_prefix + '.info.json'
+                        lib_name = core_name
+                        lib_rev = lean_githash
+                        lib_info[lib_name] = core_url
+                    segment = None
+                    if self.library_store and lib_rev:
+                        segment = self.library_store.segment(self.toolchain, lib_name, lib_rev)
+                        segments.append(segment)
+                    if lib_name not in num_olean.keys():
+                        num_olean[lib_name] = 0
+                    for fn in sorted(p.glob('**/*.olean')):
+                        rel = fn.relative_to(p)
+                        # ignore transitive dependencies
+                        if '_target' in rel.parts:
+                            continue
+                        # ignore olean files from deleted / renamed lean files
+                        if not fn.with_suffix('.lean').is_file():
+                            continue
+                        elif rel in already_seen:
+                            print('duplicate: {0}'.format(fn))
+                        else:
+                            if segment:
+                                num_stored += segment.add(zf, fn, rel.as_posix(), self.date_time)
+                            elif self.date_time:
+                                zf.writestr(olean_zip_info(fn, rel.as_posix(), self.date_time), fn.read_bytes(), compresslevel=9)
+                            else:
+                                zf.write(fn, arcname=str(rel))
+                            oleans[str(rel)[:-6]] = lib_name
+                            num_olean[lib_name] += 1
+                            already_seen.add(rel)
+                    if num_olean[lib_name] == 0:
+                        del lib_info[lib_name]
+                    else:
+                        print('Added {0} olean files from {1}'.format(num_olean[lib_name], lib_name))
+            print('Created {0} with {1} olean files'.format(library_zip_fn, len(already_seen)))
+            if self.library_store:
+                for segment in segments:
+                    segment.save(library_zip_fn)
+                print('Took {0} olean files from the library store {1}'.format(num_stored, self.library_store.path))
+        finally:
+            for segment in segments:
+                segment.close()
+
+        _, info_fn, map_fn = self.library_files()
         with open(info_fn, 'w') as f:
-                json.dump(lib_info, f, separators=(',', ':'))
+                json.dump(lib_info, f, separators=(',', ':'), sort_keys=bool(self.date_time))
                 f.write('\n')
                 print('Wrote info to {0}'.format(info_fn))
 
-        map_fn = library_prefix + '.olean_map.json'
         with open(map_fn, 'w') as f:
-                json.dump(oleans, f, separators=(',', ':'))
+                json.dump(oleans, f, separators=(',', ':'), sort_keys=bool(self.date_time))
                 f.write('\n')
-                print('Wrote olean map to {0}'.format(map_fn))        
+                print('Wrote olean map to {0}'.format(map_fn))
 
     def check_server_exists(self):
         self.js_wasm_path.mkdir(parents=True, exist_ok=True)
@@ -113,10 +155,19 @@ class InteractiveServer:
                 raise FileNotFoundError(f'Could not find the file "{self.js_wasm_path/f}" which is necessary to run Lean in the browser.')
 
 
+    def library_files(self):
+        """The library zip file and the files written next to it by `make_library`."""
+        library_prefix = os.path.splitext(self.library_zip_fn)[0]
+        return [self.library_zip_fn] + [library_prefix + suffix
+                for suffix in ['.info.json', '.olean_map.json']]
+
     def copy_files(self, make_lib=True):
+        """Returns the list of the files copied to the output folder. The library is not included:
+        the browser keeps it in IndexedDB, and the files written next to it are never downloaded."""
         self.check_server_exists()
         
-        distutils.dir_util.copy_tree(self.interactive_path / 'dist', str(Path(self.outdir)))
-        distutils.dir_util.copy_tree(self.js_wasm_path, str(Path(self.outdir)))
+        outputs = distutils.dir_util.copy_tree(str(self.interactive_path / 'dist'), str(Path(self.outdir)))
+        outputs += distutils.dir_util.copy_tree(str(self.js_wasm_path), str(Path(self.outdir)))
         if make_lib:
-            self.make_library()
\ No newline at end of file
+            self.make_library()
+        return outputs
\ No newline at end of file
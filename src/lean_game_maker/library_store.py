@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+import os, re, io, struct, hashlib, zipfile, tempfile, contextlib
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+
+def slug(text: str) -> str:
+    return re.sub(r'[^\w.-]', '_', text) or '_'
+
+
+def olean_zip_info(fn: Path, arcname: str, date_time=None) -> zipfile.ZipInfo:
+    """Zip entry for the file `fn`. If `date_time` is given, it is used instead of
+    the modification time, and the permissions are fixed, so that the entry only
+    depends on the content of the file."""
+    if date_time is None:
+        zinfo = zipfile.ZipInfo.from_file(str(fn), arcname)
+    else:
+        zinfo = zipfile.ZipInfo(arcname, date_time)
+        zinfo.create_system = 3
+        zinfo.external_attr = 0o644 << 16
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    return zinfo
+
+
+def copy_compressed(src_fp, info: zipfile.ZipInfo, dst: zipfile.ZipFile, arcname: str, date_time=None) -> None:
+    """Copies the member `info` of the zip file open as `src_fp` into `dst` under
+    the name `arcname`, without decompressing and compressing it again.
+    `check_copy_compressed` makes sure that this still works with the running Python."""
+    if dst.mode not in ('w', 'x', 'a') or dst.fp is None:
+        raise ValueError('copy_compressed requires a zip file open for writing.')
+    if getattr(dst, '_writing', False):
+        raise ValueError("Can't copy into a zip file while another member is being written.")
+    # Only headers without ZIP64 extensions are written below.
+    if max(info.file_size, info.compress_size) > zipfile.ZIP64_LIMIT:
+        raise zipfile.LargeZipFile(f'"{arcname}" is too large to be copied without ZIP64 extensions.')
+    src_fp.seek(info.header_offset)
+    header = src_fp.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    src_fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+    data = src_fp.read(info.compress_size)
+
+    zinfo = zipfile.ZipInfo(arcname, date_time or info.date_time)
+    zinfo.compress_type = info.compress_type
+    if date_time is None:
+        zinfo.create_system = info.create_system
+        zinfo.external_attr = info.external_attr
+    else:
+        zinfo.create_system = 3
+        zinfo.external_attr = 0o644 << 16
+    zinfo.flag_bits = info.flag_bits & ~0x08 # sizes are known, so no data descriptor
+    zinfo.CRC = info.CRC
+    zinfo.compress_size = info.compress_size
+    zinfo.file_size = info.file_size
+
+    # `ZipFile` has no public API for adding already compressed data,
+    # so this does what `ZipFile.write` does after compressing.
+    with dst._lock:
+        dst.fp.seek(dst.start_dir)
+        zinfo.header_offset = dst.fp.tell()
+        if zinfo.header_offset > zipfile.ZIP64_LIMIT and not dst._allowZip64:
+            raise zipfile.LargeZipFile('The zip file would require ZIP64 extensions.')
+        dst.fp.write(zinfo.FileHeader(zip64=False))
+        dst.fp.write(data)
+        dst.start_dir = dst.fp.tell()
+        dst.filelist.append(zinfo)
+        dst.NameToInfo[arcname] = zinfo
+        dst._didModify = True
+
+
+_copy_compressed_checked = False
+
+def check_copy_compressed() -> None:
+    """`copy_compressed` writes to the internals of `ZipFile`. This copies a small
+    member from one zip file to another and reads it back, once per process,
+    so that a change in `zipfile` fails loudly instead of writing broken libraries."""
+    global _copy_compressed_checked
+    if _copy_compressed_checked:
+        return
+    data = b'lean game maker\n' * 64
+    src, dst = io.BytesIO(), io.BytesIO()
+    with zipfile.ZipFile(src, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=False) as zf:
+        zf.writestr('a', b'padding')
+        zf.writestr('b', data)
+    with zipfile.ZipFile(src) as src_zf, zipfile.ZipFile(dst, mode='w', allowZip64=False) as dst_zf:
+        dst_zf.writestr('c', b'padding')
+        copy_compressed(src, src_zf.getinfo('b'), dst_zf, 'd', (1980, 1, 1, 0, 0, 0))
+    with zipfile.ZipFile(dst) as zf:
+        if zf.namelist() != ['c', 'd'] or zf.read('d') != data or zf.testzip() is not None:
+            raise Exception('Copying compressed files between zip files does not work with this version of Python. '
+                    'Build without a library store.')
+    _copy_compressed_checked = True
+
+
+class LibraryStore:
+    """Olean files shared between games.
+
+    The compressed oleans of each (toolchain, library name, revision) are kept
+    in one zip file, named by the sha256 of their content. A game library takes
+    the compressed data from the store when it is there, and compresses (and
+    adds to the store) only the oleans that no other game has used yet.
+    """
+    def __init__(self, path):
+        self.path = Path(path).resolve()
+        check_copy_compressed()
+
+    def segment(self, toolchain: str, lib_name: str, lib_rev: str) -> 'LibrarySegment':
+        return LibrarySegment(self.path / slug(toolchain) / slug(lib_name) / (slug(lib_rev) + '.zip'))
+
+
+class LibrarySegment:
+    def __init__(self, path: Path):
+        self.path = path
+        self.members = {}
+        self.new_members = {} # olean hash -> name in the game library
+        self.fp = None
+        if path.is_file():
+            self.fp = open(str(path), 'rb')
+            with zipfile.ZipFile(self.fp) as zf:
+                self.members = {info.filename: info for info in zf.infolist()}
+
+    def add(self, zf: zipfile.ZipFile, fn: Path, arcname: str, date_time=None) -> bool:
+        """Adds the olean `fn` to the game library `zf`. Returns True if it was found in the store."""
+        data = fn.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self.members:
+            copy_compressed(self.fp, self.members[digest], zf, arcname, date_time)
+            return True
+        zf.writestr(olean_zip_info(fn, arcname, date_time), data, compresslevel=9)
+        self.new_members[digest] = arcname
+        return False
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Keeps other builds from saving this segment at the same time. Without
+        `fcntl`, builds saving at the same time may still drop each other's oleans,
+        which only costs compressing them again later."""
+        if fcntl is None:
+            yield
+            return
+        with open(str(self.path.with_name(self.path.name + '.lock')), 'w') as lock_fp:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fp, fcntl.LOCK_UN)
+
+    def save(self, library_zip_fn: str) -> None:
+        """Adds the oleans compressed for this game to the store, copying them from the finished game library."""
+        self.close()
+        if not self.new_members:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock():
+            # Another build may have saved the segment since it was opened, so it is read again.
+            current = LibrarySegment(self.path)
+            try:
+                new_members = {d: a for d, a in self.new_members.items() if d not in current.members}
+                if not new_members:
+                    return
+                # Written to a temporary file and renamed, so that builds reading the store never see a partial segment.
+                tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+                try:
+                    with zipfile.ZipFile(str(tmp_path), mode='w', allowZip64=False) as out, \
+                            open(library_zip_fn, 'rb') as game_fp, zipfile.ZipFile(game_fp) as game_zf:
+                        for digest, info in current.members.items():
+                            copy_compressed(current.fp, info, out, digest)
+                        for digest, arcname in new_members.items():
+                            copy_compressed(game_fp, game_zf.getinfo(arcname), out, digest)
+                except BaseException:
+                    if tmp_path.is_file():
+                        tmp_path.unlink()
+                    raise
+            finally:
+                current.close()
+            os.replace(str(tmp_path), str(self.path))
+
+    def close(self) -> None:
+        if self.fp:
+            self.fp.close()
+            self.fp = None
@@ -0,0 +1,104 @@
+// Generated by make-lean-game. Do not edit.
+//
+// Serves the files of the game from a local cache, so that a visit after the
+// first one needs no network requests. Every build writes a new version of this
+// file, with the hash of every file. When the browser sees a new version, only
+// the files whose hash changed are downloaded again.
+//
+// If the manifest is null, the game was built without "--offline": the worker
+// then removes its caches and unregisters itself.
+
+const MANIFEST = {{ manifest }};
+
+const SCOPE = self.registration.scope;
+const CACHE_PREFIX = 'lean-game:' + SCOPE + ':';
+const MANIFEST_URL = new URL('precache-manifest.json', SCOPE).href;
+
+function fileURL(path) {
+  return new URL(path, SCOPE).href;
+}
+
+const INDEX_URL = fileURL('index.html');
+const FILE_URLS = new Set(MANIFEST ? Object.keys(MANIFEST.files).map(fileURL).concat([MANIFEST_URL, SCOPE]) : []);
+
+// The page is opened as the scope itself or as index.html, with the current
+// world and level in the query, so navigations are matched without the query.
+function cacheKey(request) {
+  if (request.mode === 'navigate') {
+    const url = new URL(request.url);
+    url.search = '';
+    url.hash = '';
+    if (url.href === SCOPE || url.href === INDEX_URL) {
+      return SCOPE;
+    }
+  }
+  return request.url;
+}
+
+function sha256(buffer) {
+  return crypto.subtle.digest('SHA-256', buffer).then((digest) =>
+    Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join(''));
+}
+
+// The hash in the query keeps caches between the browser and the server from
+// answering with an older version of the file. The content is still checked,
+// and the install fails (and is retried on the next visit) if it doesn't match.
+function fetchFile(path) {
+  const url = fileURL(path);
+  const hash = MANIFEST.files[path];
+  return fetch(url + '?v=' + hash, {cache: 'no-store'}).then((res) => {
+    if (!res.ok) {
+      throw new Error('Failed to fetch ' + url);
+    }
+    return res.clone().arrayBuffer().then(sha256).then((digest) => {
+      if (digest !== hash) {
+        throw new Error('The content of ' + url + ' does not match the manifest');
+      }
+      return res;
+    });
+  });
+}
+
+function ourCaches() {
+  return caches.keys().then((keys) => keys.filter((key) => key.startsWith(CACHE_PREFIX)));
+}
+
+function precache() {
+  const cacheName = CACHE_PREFIX + MANIFEST.version;
+  return Promise.all([caches.open(cacheName), ourCaches()]).then(([cache, oldCacheNames]) =>
+    Promise.all(oldCacheNames.filter((name) => name !== cacheName).map((name) => caches.open(name)))
+      .then((oldCaches) => Promise.all(oldCaches.map((oldCache) =>
+        oldCache.match(MANIFEST_URL).then((res) => res ? res.json() : null)
+          .then((oldManifest) => ({oldCache, oldManifest})))))
+      .then((previous) => Promise.all(Object.keys(MANIFEST.files).map((path) => {
+        const url = fileURL(path);
+        const unchanged = previous.find(({oldManifest}) => oldManifest && oldManifest.files[path] === MANIFEST.files[path]);
+        const response = unchanged ? unchanged.oldCache.match(url) : Promise.resolve(undefined);
+        return response.then((res) => res || fetchFile(path)).then((res) => path === 'index.html'
+          ? Promise.all([cache.put(SCOPE, res.clone()), cache.put(url, res)])
+          : cache.put(url, res));
+      })))
+      .then(() => cache.put(MANIFEST_URL, new Response(JSON.stringify(MANIFEST),
+        {headers: {'Content-Type': 'application/json'}}))));
+}
+
+self.addEventListener('install', (event) => {
+  event.waitUntil((MANIFEST ? precache() : Promise.resolve()).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', (event) => {
+  const cacheName = MANIFEST ? CACHE_PREFIX + MANIFEST.version : null;
+  event.waitUntil(ourCaches()
+    .then((names) => Promise.all(names.filter((name) => name !== cacheName).map((name) => caches.delete(name))))
+    .then(() => MANIFEST ? self.clients.claim() : self.registration.unregister()));
+});
+
+self.addEventListener('fetch', (event) => {
+  const key = cacheKey(event.request);
+  if (event.request.method !== 'GET' || !FILE_URLS.has(key)) {
+    return;
+  }
+  event.respondWith(caches.open(CACHE_PREFIX + MANIFEST.version)
+    .then((cache) => cache.match(key))
+    .then((res) => res || fetch(event.request)));
+});
@@ -5,13 +5,27 @@ import gettext
 import subprocess
 
 
+# Compiled catalogs are cached by path and modification time. Unlike the cache
+# inside `gettext.translation`, this one notices when a `.mo` file is rebuilt.
+_catalog_cache = {}
+
+def load_catalog(lang):
+    mo_path = gettext.find('content', localedir=Path('.')/'locale', languages=[lang])
+    if mo_path is None:
+        return gettext.NullTranslations()
+    key = (str(Path(mo_path).resolve()), Path(mo_path).stat().st_mtime)
+    if key not in _catalog_cache:
+        with open(mo_path, 'rb') as f:
+            _catalog_cache[key] = gettext.GNUTranslations(f)
+    return _catalog_cache[key]
+
 
 class Translator:
-    def __init__(self, locale, version):
+    def __init__(self, locale, version, build_date=None):
         self.pot = POFile(check_for_duplicate=True)
         self.pot.metadata = {
         	'Project-Id-Version': version,
-        	'POT-Creation-Date': str(datetime.now()),
+        	'POT-Creation-Date': str(build_date or datetime.now()),
         	'MIME-Version': '1.0',
         	'Content-Type': 'text/plain; charset=utf-8',
         }
@@ -29,8 +43,7 @@ class Translator:
                 else:
                     print(f'The file "{str(mo_path)}" or "{str(po_path)}" not found.')
                     print(f'Using the original Lean files for "{lang}".\n')
-            self.translations =[gettext.translation('content', localedir=Path('.')/'locale',
-                languages=[lang], fallback=True) for lang in self.languages]
+            self.translations = [load_catalog(lang) for lang in self.languages]
 
         self.original_texts = []
         self.translated_texts = [[] for lang in self.languages]